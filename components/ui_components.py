@@ -19,11 +19,22 @@ def render_tips_section():
             "- Demonstrate your technical capabilities\n"
             "- Explain your motivation for the project")
 
-def render_file_info(uploaded_file):
+def render_file_info(uploaded_file, page_texts=None, slim_report=None):
     if uploaded_file:
         st.success("✅ PDF uploaded successfully")
         file_size = uploaded_file.size / 1024
         st.caption(f"File size: {file_size:.1f} KB")
+        if slim_report:
+            slimmed_size = slim_report['slimmed_size'] / 1024
+            saved = slim_report['original_size'] - slim_report['slimmed_size']
+            st.caption(
+                f"Sent for analysis: {slimmed_size:.1f} KB "
+                f"({saved / 1024:.1f} KB saved, {100 * saved / slim_report['original_size']:.0f}% smaller)"
+            )
+        if page_texts is not None:
+            st.caption(f"Pages: {len(page_texts)}")
+            if not any(text.strip() for text in page_texts):
+                st.warning("No selectable text found. Scanned proposals may be reviewed less accurately.")
 
 def render_metrics_display(metrics):
     st.markdown("### Key Metrics")
@@ -112,6 +123,13 @@ def render_timeline(timeline):
         """, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+def render_unfinished_stage(title, status):
+    st.markdown(f"### {title}")
+    if status == "pending":
+        st.info("⏳ Still being analyzed. Use \"Retry unfinished sections\" to pick up the result.")
+    else:
+        st.warning("⚠️ This section could not be generated. Use \"Retry unfinished sections\" to try again.")
+
 def render_detailed_feedback(feedback):
     st.markdown("## Detailed Feedback")
     st.markdown('<div class="feedback-box">', unsafe_allow_html=True)
@@ -1,14 +1,18 @@
 import streamlit as st
 
-from utils.helpers import setup_page_config, process_proposal
+from utils.helpers import (
+    setup_page_config, process_proposal, update_review_state,
+    collect_late_results, get_missing_stages
+)
 from styles.app_styles import get_app_styles
 from components.ui_components import (
     render_header, render_tips_section, render_file_info,
     render_metrics_display, render_strengths_weaknesses, render_timeline,
     render_detailed_feedback, render_export_options, render_about_section,
-    render_footer
+    render_footer, render_unfinished_stage
 )
 from services.ai_service import initialize_genai
+from services.speculation import start_speculation
 
 # page setup
 setup_page_config()
@@ -25,41 +29,85 @@ with tab1:
         uploaded_file = st.file_uploader("Upload your GSoC proposal (PDF)", type="pdf")
         problem_statement = st.text_area("Enter the project/problem statement", height=150)
         reviewer_mode = st.checkbox("I am a project mentor/reviewer")
+        slim_pdf = st.checkbox(
+            "Shrink images and fonts before analysis", value=True,
+            help="Recompresses large images and drops embedded fonts, metadata and blank pages so big PDFs upload faster."
+        )
         
         submit_button = st.button("Generate Feedback", type="primary", disabled=not uploaded_file)
+        
+        # get a head start on everything that doesn't need the button click
+        speculation = start_speculation(initialize_genai(), uploaded_file, problem_statement, reviewer_mode, slim_pdf)
     
     with col2:
         render_tips_section()
-        render_file_info(uploaded_file)
+        render_file_info(
+            uploaded_file,
+            speculation.get_page_texts() if speculation else None,
+            speculation.get_slim_report() if speculation else None
+        )
 
     if submit_button and uploaded_file:
         with st.spinner("Analyzing your proposal..."):
             client = initialize_genai()
             
             if uploaded_file:
-                results = process_proposal(client, uploaded_file, problem_statement, reviewer_mode)
+                results = process_proposal(client, uploaded_file, problem_statement, reviewer_mode, slim=slim_pdf)
                 
                 if results['success']:
-                    st.session_state.metrics = results['metrics']
-                    st.session_state.timeline = results['timeline']
-                    st.session_state.feedback = results['feedback']
-                    st.session_state.has_feedback = True
+                    update_review_state(results)
             else:
                 st.error("Could not process the PDF. Please try again with a different file.")
 
     if 'has_feedback' in st.session_state and st.session_state.has_feedback:
+        collect_late_results()
+        missing_stages = get_missing_stages()
+        
         st.markdown("## Proposal Analysis")
         
-        overall_score = render_metrics_display(st.session_state.metrics)
-        render_strengths_weaknesses(st.session_state.metrics)
-        render_timeline(st.session_state.timeline)
-        render_detailed_feedback(st.session_state.feedback)
-        render_export_options(
-            st.session_state.metrics,
-            st.session_state.timeline,
-            st.session_state.feedback,
-            overall_score
+        # retries reuse the review's own inputs so sections never mix proposals or statements
+        review_inputs = st.session_state.review_inputs
+        same_file = uploaded_file is not None and uploaded_file.file_id == review_inputs['file_id']
+        retry_button = missing_stages and st.button(
+            "Retry unfinished sections", disabled=not same_file,
+            help="Uses the file, problem statement and mode this review was generated with."
         )
+        if retry_button:
+            with st.spinner("Finishing the remaining sections..."):
+                results = process_proposal(
+                    initialize_genai(), uploaded_file,
+                    review_inputs['problem_statement'], review_inputs['reviewer_mode'],
+                    stages=missing_stages, slim=review_inputs['slim']
+                )
+                if results['success']:
+                    update_review_state(results)
+            missing_stages = get_missing_stages()
+        
+        stage_status = st.session_state.stage_status
+        
+        if "metrics" in missing_stages:
+            render_unfinished_stage("Key Metrics", stage_status.get("metrics"))
+        else:
+            overall_score = render_metrics_display(st.session_state.metrics)
+            render_strengths_weaknesses(st.session_state.metrics)
+        
+        if "timeline" in missing_stages:
+            render_unfinished_stage("Project Timeline", stage_status.get("timeline"))
+        else:
+            render_timeline(st.session_state.timeline)
+        
+        if "feedback" in missing_stages:
+            render_unfinished_stage("Detailed Feedback", stage_status.get("feedback"))
+        else:
+            render_detailed_feedback(st.session_state.feedback)
+        
+        if not missing_stages:
+            render_export_options(
+                st.session_state.metrics,
+                st.session_state.timeline,
+                st.session_state.feedback,
+                overall_score
+            )
 
 with tab2:
     render_about_section()
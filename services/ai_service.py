@@ -1,13 +1,40 @@
 import streamlit as st
 import json
 from google import genai
-from google.genai.types import GenerateContentConfig, Part
+from google.genai.types import GenerateContentConfig, HttpOptions, Part
+
+# seconds, each one can be overridden in secrets.toml (e.g. TIMELINE_TIMEOUT_SECONDS = 30)
+STAGE_TIMEOUTS = {
+    "metrics": 60,
+    "timeline": 45,
+    "feedback": 90,
+}
+REVIEW_TIMEOUT = 120
+
+class StageError(Exception):
+    pass
+
+# passed as on_error when the failure has to travel with the result, e.g. to every
+# session sharing one in-flight call, instead of being drawn on the leader's page
+def raise_stage_error(message):
+    raise StageError(message)
+
+def get_stage_timeout(stage):
+    return float(st.secrets.get(f"{stage.upper()}_TIMEOUT_SECONDS", STAGE_TIMEOUTS[stage]))
+
+def get_review_timeout():
+    return float(st.secrets.get("REVIEW_TIMEOUT_SECONDS", REVIEW_TIMEOUT))
 
 @st.cache_resource
 def initialize_genai():
-    return genai.Client(api_key=st.secrets["GOOGLE_API_KEY"])
+    # a hung request gives up at the HTTP level too, so it doesn't hold a worker forever
+    timeout_ms = int(max(get_stage_timeout(stage) for stage in STAGE_TIMEOUTS) * 1000)
+    return genai.Client(
+        api_key=st.secrets["GOOGLE_API_KEY"],
+        http_options=HttpOptions(timeout=timeout_ms)
+    )
 
-def analyze_proposal_metrics(client, pdf_file, problem_statement):
+def analyze_proposal_metrics(client, pdf_file, problem_statement, on_error=st.error):
     default_metrics = {
         "technical_depth": 20,
         "project_understanding": 20,
@@ -121,13 +148,15 @@ def analyze_proposal_metrics(client, pdf_file, problem_statement):
             return metrics
             
         except json.JSONDecodeError as e:
-            st.error(f"Error parsing metrics JSON: {str(e)}")
+            on_error(f"Error parsing metrics JSON: {str(e)}")
             return default_metrics
+    except StageError:
+        raise
     except Exception as e:
-        st.error(f"Error analyzing proposal: {str(e)}")
+        on_error(f"Error analyzing proposal: {str(e)}")
         return default_metrics
 
-def get_ai_review(client, pdf_file, problem_statement, reviewer_mode=False):
+def get_ai_review(client, pdf_file, problem_statement, reviewer_mode=False, on_error=st.error):
     system_prompt = """You are a balanced GSoC proposal evaluator with high standards. Your task is to provide constructive feedback that is:
     
     - Extremely critical and direct when fundamental elements are missing
@@ -196,10 +225,10 @@ def get_ai_review(client, pdf_file, problem_statement, reviewer_mode=False):
         response = chat.send_message([pdf_part, user_prompt])
         return response.text
     except Exception as e:
-        st.error(f"Error generating AI review: {str(e)}")
+        on_error(f"Error generating AI review: {str(e)}")
         return "Failed to generate review. Please check your API key and try again."
 
-def extract_project_timeline(client, pdf_file):
+def extract_project_timeline(client, pdf_file, on_error=st.error):
     system_prompt = """You are a GSoC timeline analyzer who looks for explicitly mentioned project schedules or timelines.
     
     Your evaluation approach:
@@ -250,8 +279,10 @@ def extract_project_timeline(client, pdf_file):
             return timeline
             
         except json.JSONDecodeError as e:
-            st.error(f"Error parsing timeline JSON: {str(e)}")
+            on_error(f"Error parsing timeline JSON: {str(e)}")
             return {"No Timeline": "Failed to parse timeline data from the proposal."}
+    except StageError:
+        raise
     except Exception as e:
-        st.error(f"Error extracting timeline: {str(e)}")
+        on_error(f"Error extracting timeline: {str(e)}")
         return {"No Timeline": "Failed to extract timeline from the proposal."}
@@ -0,0 +1,73 @@
+import logging
+import threading
+from concurrent.futures import CancelledError, Future
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# the first caller for a key starts the call, anyone arriving with the same key before
+# it finishes gets the same future instead of firing a duplicate request, so waiting
+# for a shared call never takes up a worker thread
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def submit(self, key, executor, fn, *args, **kwargs):
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = executor.submit(fn, *args, **kwargs)
+                self._in_flight[key] = future
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+            stats = dict(self._stats, in_flight=len(self._in_flight))
+
+        if is_leader:
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.info(
+                "Coalesced request %s onto the call in flight (leaders=%d, coalesced=%d, in_flight=%d)",
+                key[0], stats["leaders"], stats["coalesced"], stats["in_flight"]
+            )
+        # callers get a future of their own, cancelling it never cancels the shared call
+        return chain(future, lambda done: done)
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+def _copy_outcome(source, target):
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+# once source is done, start(source) returns the next future to follow; the chained
+# future settles with that one's outcome without any thread blocking in between
+def chain(source, start):
+    chained = Future()
+
+    def on_source_done(done):
+        if not chained.set_running_or_notify_cancel():
+            return
+        try:
+            next_future = start(done)
+        except BaseException as e:
+            chained.set_exception(e)
+            return
+        next_future.add_done_callback(lambda finished: _copy_outcome(finished, chained))
+
+    source.add_done_callback(on_source_done)
+    return chained
+
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
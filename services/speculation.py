@@ -0,0 +1,136 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from services.ai_service import (
+    analyze_proposal_metrics, extract_project_timeline, get_ai_review, raise_stage_error
+)
+from services.request_coalescing import chain, get_single_flight
+from utils.helpers import extract_pdf_text, get_review_hash, prepare_proposal_pdf
+
+# how long the problem statement and mode must stay unchanged before the stages that
+# depend on them are started
+STATEMENT_SETTLE_SECONDS = 3
+
+class SpeculationError(Exception):
+    pass
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="proposal-worker")
+
+class SpeculativeRun:
+    def __init__(self, file_id, slim, original_bytes, inputs):
+        self.file_id = file_id
+        self.slim = slim
+        self.file_hash = get_review_hash(io.BytesIO(original_bytes), slim)
+        self.original_bytes = original_bytes
+        self.cancel_event = threading.Event()
+        self.futures = {}
+        # whatever is already filled in at upload counts as settled
+        self.inputs = inputs
+        self.inputs_changed_at = None
+        # slimming is the first job on the pool so a large upload never blocks the page
+        self.prepared = get_executor().submit(prepare_proposal_pdf, io.BytesIO(original_bytes), slim)
+
+    def submit(self, key, fn, *args, **kwargs):
+        if key in self.futures:
+            return
+
+        def run():
+            if self.cancel_event.is_set():
+                raise SpeculationError("Speculative work was cancelled")
+            return fn(*args, **kwargs)
+
+        self.futures[key] = get_executor().submit(run)
+
+    # background threads have no page to draw on, so failures are raised instead and
+    # the click simply redoes that stage
+    def submit_stage(self, key, fn, client, *args):
+        if key in self.futures:
+            return
+        single_flight = get_single_flight()
+        executor = get_executor()
+
+        # the call is only issued once slimming is done, nothing holds a worker while it waits
+        def issue(prepared):
+            if self.cancel_event.is_set():
+                raise SpeculationError("Speculative work was cancelled")
+            pdf_file = io.BytesIO(prepared.result()[0])
+            return single_flight.submit(key, executor, fn, client, pdf_file, *args, on_error=raise_stage_error)
+
+        self.futures[key] = chain(self.prepared, issue)
+
+    # only work still queued is dropped, a call that has already started runs to the
+    # end and its result is simply not used
+    def discard_except(self, keys):
+        for key in list(self.futures):
+            if key not in keys:
+                self.futures.pop(key).cancel()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.prepared.cancel()
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def get_future(self, key):
+        return self.futures.get(key)
+
+    def get_slim_report(self):
+        if not self.prepared.done() or self.prepared.cancelled() or self.prepared.exception():
+            return None
+        return self.prepared.result()[1]
+
+    def get_page_texts(self):
+        future = self.futures.get(("text", self.file_hash))
+        if future is None or not future.done() or future.cancelled() or future.exception():
+            return None
+        return future.result()
+
+def start_speculation(client, uploaded_file, problem_statement, reviewer_mode, slim=True):
+    run = st.session_state.get('speculation')
+
+    inputs = (problem_statement, reviewer_mode)
+
+    if uploaded_file is None:
+        if run is not None:
+            run.cancel()
+            del st.session_state['speculation']
+        return None
+
+    if run is None or run.file_id != uploaded_file.file_id or run.slim != slim:
+        if run is not None:
+            run.cancel()
+        run = SpeculativeRun(uploaded_file.file_id, slim, uploaded_file.getvalue(), inputs)
+        st.session_state.speculation = run
+
+    # slimming, hashing, text extraction and the timeline don't depend on what the user types
+    keys = [("text", run.file_hash), ("timeline", run.file_hash)]
+    run.submit(keys[0], extract_pdf_text, run.original_bytes)
+    run.submit_stage(keys[1], extract_project_timeline, client)
+
+    # the statement-dependent stages send the whole PDF twice, so after an edit they only
+    # start once the statement and mode have been left alone for a few seconds
+    if inputs != run.inputs:
+        run.inputs = inputs
+        run.inputs_changed_at = time.monotonic()
+    settled = (
+        run.inputs_changed_at is None
+        or time.monotonic() - run.inputs_changed_at >= STATEMENT_SETTLE_SECONDS
+    )
+
+    if problem_statement.strip() and settled:
+        metrics_key = ("metrics", run.file_hash, problem_statement)
+        review_key = ("review", run.file_hash, problem_statement, reviewer_mode)
+        run.submit_stage(metrics_key, analyze_proposal_metrics, client, problem_statement)
+        run.submit_stage(review_key, get_ai_review, client, problem_statement, reviewer_mode)
+        keys += [metrics_key, review_key]
+
+    # drop what is still queued for an older problem statement or mode
+    run.discard_except(keys)
+    return run
@@ -1,4 +1,13 @@
+import hashlib
+import io
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait
+
 import streamlit as st
+from pypdf import PdfReader
+
+STAGES = ("metrics", "timeline", "feedback")
 
 def setup_page_config():
     st.set_page_config(
@@ -8,26 +17,152 @@ def setup_page_config():
         initial_sidebar_state="expanded"
     )
 
-def process_proposal(client, uploaded_file, problem_statement, reviewer_mode):
-    from services.ai_service import analyze_proposal_metrics, extract_project_timeline, get_ai_review
+def get_file_hash(uploaded_file):
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+def get_review_hash(uploaded_file, slim):
+    # the slimmed and the original upload of one file are sent as different requests
+    file_hash = get_file_hash(uploaded_file)
+    return f"{file_hash}-slim" if slim else file_hash
+
+def prepare_proposal_pdf(uploaded_file, slim=True):
+    from utils.pdf_slimming import slim_pdf
+    
+    pdf_bytes = uploaded_file.getvalue()
+    if not slim:
+        return pdf_bytes, None
+    return slim_pdf(hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes)
+
+def extract_pdf_text(pdf_bytes):
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [page.extract_text() or "" for page in reader.pages]
+
+def _succeeded(future):
+    return not future.cancelled() and future.exception() is None
+
+def _start_stage(speculation, prepared, single_flight, executor, cancel_event, key, fn, client, *args, **kwargs):
+    from services.request_coalescing import chain
+
+    def send(done_prepared):
+        # waiting on speculation or slimming can take a while, a newer click may have superseded us meanwhile
+        if cancel_event.is_set():
+            raise CancelledError()
+        pdf_file = io.BytesIO(done_prepared.result()[0])
+        return single_flight.submit(key, executor, fn, client, pdf_file, *args, **kwargs)
+
+    def issue(_):
+        return chain(prepared, send)
+
+    # reuse whatever the upload already started for these exact inputs, and only
+    # issue a call of our own when that failed
+    future = speculation.get_future(key) if speculation is not None else None
+    if future is None:
+        return issue(None)
+    return chain(future, lambda done: done if _succeeded(done) else issue(done))
+
+def process_proposal(client, uploaded_file, problem_statement, reviewer_mode, stages=STAGES, slim=True):
+    from services.ai_service import (
+        analyze_proposal_metrics, extract_project_timeline, get_ai_review,
+        get_stage_timeout, get_review_timeout, raise_stage_error
+    )
+    from services.request_coalescing import get_single_flight
+    from services.speculation import get_executor
+    
+    # the deadline covers everything from here on, slimming included
+    started = time.monotonic()
+    
+    # a new click supersedes the previous run: its queued stages are cancelled and the
+    # rest stop before joining or issuing a call, a request already sent still finishes
+    previous_run = st.session_state.get('active_run')
+    if previous_run is not None:
+        previous_run['cancel_event'].set()
+        for future in previous_run['futures']:
+            future.cancel()
+    cancel_event = threading.Event()
+    st.session_state.active_run = {'cancel_event': cancel_event, 'futures': []}
     
     progress_bar = st.progress(0)
-    results = {}
+    results = {'stage_status': {}, 'pending': {}}
+    # kept so a retry finishes the review with the same inputs it started with
+    results['inputs'] = {
+        'file_id': uploaded_file.file_id,
+        'problem_statement': problem_statement,
+        'reviewer_mode': reviewer_mode,
+        'slim': slim,
+    }
+    
+    # mentors opening the same proposal at once share the calls already in flight
+    single_flight = get_single_flight()
+    file_hash = get_review_hash(uploaded_file, slim)
+    speculation = st.session_state.get('speculation')
+    if speculation is not None and speculation.file_hash != file_hash:
+        speculation = None
+    executor = get_executor()
+    # slimming started on upload is most likely done already, otherwise it runs on the pool
+    # and each stage sends its call as soon as the slimmed bytes are there
+    if speculation is not None:
+        prepared = speculation.prepared
+    else:
+        prepared = executor.submit(prepare_proposal_pdf, io.BytesIO(uploaded_file.getvalue()), slim)
+    
+    stage_calls = {
+        "metrics": (
+            ("metrics", file_hash, problem_statement),
+            analyze_proposal_metrics, (problem_statement,)
+        ),
+        "timeline": (
+            ("timeline", file_hash),
+            extract_project_timeline, ()
+        ),
+        "feedback": (
+            ("review", file_hash, problem_statement, reviewer_mode),
+            get_ai_review, (problem_statement, reviewer_mode)
+        ),
+    }
+    
+    def start_stage(stage):
+        key, fn, args = stage_calls[stage]
+        # failures are raised so every session sharing the call sees them, worker
+        # threads can't draw on the page so they are shown once the wait is over
+        return _start_stage(
+            speculation, prepared, single_flight, executor, cancel_event, key, fn, client, *args,
+            on_error=raise_stage_error
+        )
     
     try:
-        progress_bar.progress(20)
-        metrics = analyze_proposal_metrics(client, uploaded_file, problem_statement)
-        results['metrics'] = metrics
+        review_timeout = get_review_timeout()
+        futures = {stage: start_stage(stage) for stage in stages}
+        st.session_state.active_run['futures'] = list(futures.values())
+        deadlines = {stage: started + min(get_stage_timeout(stage), review_timeout) for stage in stages}
         
-        progress_bar.progress(40)
-        timeline = extract_project_timeline(client, uploaded_file)
-        results['timeline'] = timeline
+        waiting = set(stages)
+        while waiting:
+            now = time.monotonic()
+            waiting = {stage for stage in waiting if not futures[stage].done() and deadlines[stage] > now}
+            progress_bar.progress(int(100 * (len(stages) - len(waiting)) / len(stages)))
+            if not waiting:
+                break
+            next_deadline = min(deadlines[stage] for stage in waiting)
+            wait([futures[stage] for stage in waiting], timeout=next_deadline - now, return_when=FIRST_COMPLETED)
         
-        progress_bar.progress(70)
-        feedback = get_ai_review(client, uploaded_file, problem_statement, reviewer_mode)
-        results['feedback'] = feedback
+        for stage in stages:
+            future = futures[stage]
+            if not future.done():
+                results[stage] = None
+                results['stage_status'][stage] = "pending"
+                results['pending'][stage] = future
+                continue
+            
+            error = future.exception()
+            if error is None:
+                results[stage] = future.result()
+                results['stage_status'][stage] = "done"
+            else:
+                if not isinstance(error, CancelledError):
+                    st.error(str(error))
+                results[stage] = None
+                results['stage_status'][stage] = "failed"
         
-        progress_bar.progress(100)
         results['success'] = True
     except Exception as e:
         st.error(f"Error processing proposal: {str(e)}")
@@ -36,3 +171,36 @@ def process_proposal(client, uploaded_file, problem_statement, reviewer_mode):
         progress_bar.empty()
         
     return results
+
+def update_review_state(results):
+    stage_status = st.session_state.setdefault('stage_status', {})
+    pending_stages = st.session_state.setdefault('pending_stages', {})
+    
+    for stage, status in results['stage_status'].items():
+        st.session_state[stage] = results[stage]
+        stage_status[stage] = status
+        pending_stages.pop(stage, None)
+    pending_stages.update(results['pending'])
+    st.session_state.review_inputs = results['inputs']
+    st.session_state.has_feedback = True
+
+def collect_late_results():
+    # stages that missed their deadline may have finished since the last rerun
+    stage_status = st.session_state.get('stage_status', {})
+    pending_stages = st.session_state.get('pending_stages', {})
+    
+    for stage, future in list(pending_stages.items()):
+        if not future.done():
+            continue
+        del pending_stages[stage]
+        if _succeeded(future):
+            st.session_state[stage] = future.result()
+            stage_status[stage] = "done"
+        else:
+            if not future.cancelled() and not isinstance(future.exception(), CancelledError):
+                st.error(str(future.exception()))
+            stage_status[stage] = "failed"
+
+def get_missing_stages():
+    stage_status = st.session_state.get('stage_status', {})
+    return [stage for stage in STAGES if stage_status.get(stage) != "done"]
@@ -0,0 +1,148 @@
+import io
+import re
+
+import streamlit as st
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+
+MAX_IMAGE_SIDE = 1600
+IMAGE_QUALITY = 70
+MIN_IMAGE_BYTES = 32 * 1024
+
+FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+STRIPPABLE_FONT_TYPES = ("/Type1", "/TrueType")
+STANDARD_ENCODINGS = ("/WinAnsiEncoding", "/MacRomanEncoding", "/StandardEncoding")
+SYMBOLIC_FONT_FLAG = 1 << 2
+PAGE_METADATA_KEYS = ("/Metadata", "/PieceInfo", "/Thumb")
+
+# painting (fill, stroke, shading), text showing (Tj, TJ, ' and ") and image (BI, Do) operators,
+# a page whose content has none of these and no annotations draws nothing
+DRAWING_OPERATORS = re.compile(rb"(?:^|[\s)\]>])(?:f\*?|F|S|s|B\*?|b\*?|sh|Tj|TJ|'|\"|BI|Do)(?=[\s(\[<]|$)")
+
+def _resolve(dictionary, key):
+    value = dictionary.get(key)
+    return value.get_object() if value is not None else None
+
+def _is_blank_page(page):
+    if _resolve(page, "/Annots"):
+        return False
+    if (page.extract_text() or "").strip():
+        return False
+    resources = page.get("/Resources")
+    if resources is not None and resources.get_object().get("/XObject"):
+        return False
+    contents = page.get_contents()
+    return contents is None or not DRAWING_OPERATORS.search(contents.get_data())
+
+def _recompress_image(image):
+    xobject = image.indirect_reference.get_object()
+    if "/SMask" in xobject or "/Mask" in xobject:
+        # replacing would drop the transparency and leave black boxes behind
+        return False
+    # pypdf drops /Length when parsing, so the extracted image file is the closest public measure;
+    # for non-JPEG images that is a PNG re-encoding, not the size stored in the PDF
+    original_size = len(image.data)
+    if original_size < MIN_IMAGE_BYTES:
+        return False
+
+    img = image.image
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+    if buffer.tell() >= original_size:
+        return False
+
+    image.replace(img, quality=IMAGE_QUALITY)
+    return True
+
+def _strip_embedded_fonts(page):
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources is not None else None
+    if not fonts:
+        return 0
+
+    removed = 0
+    for font_ref in fonts.get_object().values():
+        font = font_ref.get_object()
+        # only simple fonts in a standard encoding can be drawn by a substitute font, Type0/CID
+        # fonts (e.g. Identity-H from Chrome and Google Docs), Type3 and custom encodings need
+        # their own font program or the page renders as boxes
+        if _resolve(font, "/Subtype") not in STRIPPABLE_FONT_TYPES:
+            continue
+        if _resolve(font, "/Encoding") not in STANDARD_ENCODINGS:
+            continue
+        descriptor = _resolve(font, "/FontDescriptor")
+        if descriptor is None:
+            continue
+        if int(_resolve(descriptor, "/Flags") or 0) & SYMBOLIC_FONT_FLAG:
+            continue
+        for key in FONT_FILE_KEYS:
+            if key in descriptor:
+                del descriptor[key]
+                removed += 1
+    return removed
+
+def _slim(pdf_bytes):
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    report = {"pages_removed": 0, "images_recompressed": 0, "fonts_removed": 0}
+
+    for page in reader.pages:
+        if _is_blank_page(page):
+            report["pages_removed"] += 1
+        else:
+            writer.add_page(page)
+
+    if not writer.pages:
+        return pdf_bytes, None
+
+    # a logo or diagram shared by several pages is one XObject, recompress it only once
+    # instead of losing quality on every page it appears on
+    handled_images = set()
+    for page in writer.pages:
+        for image in page.images:
+            reference = image.indirect_reference
+            if reference is not None:
+                if (reference.idnum, reference.generation) in handled_images:
+                    continue
+                handled_images.add((reference.idnum, reference.generation))
+            try:
+                if _recompress_image(image):
+                    report["images_recompressed"] += 1
+            except Exception:
+                # inline or exotic images are sent as they are
+                continue
+        report["fonts_removed"] += _strip_embedded_fonts(page)
+        for key in PAGE_METADATA_KEYS:
+            if key in page:
+                del page[key]
+        page.compress_content_streams()
+
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue(), report
+
+# cached by the hash of the original file, the bytes themselves are left out of the cache key
+@st.cache_data(max_entries=32, show_spinner=False)
+def _slim_cached(file_hash, _pdf_bytes):
+    try:
+        slimmed_bytes, report = _slim(_pdf_bytes)
+    except Exception:
+        return None, None
+
+    if report is None or len(slimmed_bytes) >= len(_pdf_bytes):
+        return None, None
+
+    report["original_size"] = len(_pdf_bytes)
+    report["slimmed_size"] = len(slimmed_bytes)
+    return slimmed_bytes, report
+
+# only files that actually got smaller keep bytes in the cache, otherwise the caller's own are returned
+def slim_pdf(file_hash, pdf_bytes):
+    slimmed_bytes, report = _slim_cached(file_hash, pdf_bytes)
+    return (slimmed_bytes if slimmed_bytes is not None else pdf_bytes), report